@@ -6,11 +6,18 @@ from app.services.vector_store import VectorStore
 from app.services.clause_matcher import ClauseMatcher
 from app.services.logic_evaluator import EnhancedLogicEvaluator
 from app.services.response_builder import EnhancedResponseBuilder  
+from app.services.semantic_cache import SemanticCache
 from app.core.config import settings
 from app.utils.monitoring import monitor_performance
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
-from typing import List
+import hashlib
+from typing import Callable, Dict, Iterable, List, Tuple
+from urllib.parse import urlparse
 import logging
+import os
+import shutil
 import time
 
 logger = logging.getLogger(__name__)
@@ -32,13 +39,256 @@ try:
     CLAUSE_MATCHER = ClauseMatcher(VECTOR_STORE)
     logger.info("All services initialized successfully.")
 except Exception as e:
-    logger.critical(f"Fatal error during global service initialization: {e}", exc_info=True)
+    logger.critical("Fatal error during global service initialization: %s", e, exc_info=True)
     # In a real production scenario, you might want to prevent the app from starting.
     # For the hackathon, we'll log the error and let it proceed.
     DOC_LOADER, QUERY_PARSER, VECTOR_STORE, LOGIC_EVALUATOR, CLAUSE_MATCHER = (None, None, None, None, None)
 
+# Document loaders by file extension
+_LOADERS: Dict[str, Callable[[bytes], Iterable[Tuple[str, int]]]] = {
+    '.pdf': DOC_LOADER.extract_text_from_pdf,
+    '.docx': DocumentLoader.extract_text_from_docx,
+} if DOC_LOADER else {}
+
+# The answer cache is optional: if it cannot be opened, requests simply run the full pipeline.
+SEMANTIC_CACHE = None
+if settings.CACHE_ENABLED and VECTOR_STORE is not None:
+    try:
+        SEMANTIC_CACHE = SemanticCache(
+            VECTOR_STORE.model,  # reuse the loaded sentence transformer
+            db_path=settings.CACHE_DB_PATH,
+            similarity_threshold=settings.CACHE_SIMILARITY_THRESHOLD,
+            ttl_seconds=settings.CACHE_TTL_SECONDS
+        )
+    except Exception as e:
+        logger.error("Semantic cache unavailable, continuing without it: %s", e)
+
+async def warm_up_services():
+    """Trigger lazy model initialization so the first real request does not pay for it"""
+    if VECTOR_STORE is None or LOGIC_EVALUATOR is None:
+        return
+    start_time = time.time()
+    try:
+        VECTOR_STORE.model.encode(["warmup"] * 2, batch_size=2, show_progress_bar=False)
+    except Exception as e:
+        logger.warning("Embedding model warm-up failed: %s", e)
+    await LOGIC_EVALUATOR.ping()
+    logger.info("Services warmed up in %.2fs", time.time() - start_time)
+
+# ==============================================================================
+# DOCUMENT CACHE
+# ==============================================================================
+# Fully indexed documents are kept in a small LRU keyed by URL hash, so repeated
+# requests for the same document skip download, extraction, chunking and embedding.
+# Entries expire after CACHE_TTL_SECONDS so an updated document at the same URL is picked up.
+
+DOC_CACHE: "OrderedDict[str, Tuple[float, VectorStore]]" = OrderedDict()
+_DOC_CACHE_LOCKS: Dict[str, asyncio.Lock] = {}
+# Requests holding or waiting for each document lock; the lock is dropped when this reaches zero
+_DOC_CACHE_LOCK_USERS: Dict[str, int] = defaultdict(int)
+
+# Bounded queues between pipeline stages keep memory flat for very large documents
+PIPELINE_QUEUE_SIZE = 16
+_PIPELINE_DONE = object()
+# Page extraction runs on one dedicated thread since PyMuPDF must not be driven concurrently
+_EXTRACT_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-extract")
+
+
+async def _get_document_store(url: str) -> VectorStore:
+    """Return the vector store for a document, building it on a cache miss"""
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    # One lock per document so concurrent requests for the same URL build it only once
+    lock = _DOC_CACHE_LOCKS.setdefault(key, asyncio.Lock())
+    _DOC_CACHE_LOCK_USERS[key] += 1
+    try:
+        async with lock:
+            if key in DOC_CACHE:
+                built_at, document_store = DOC_CACHE[key]
+                if time.time() - built_at <= settings.CACHE_TTL_SECONDS:
+                    DOC_CACHE.move_to_end(key)
+                    logger.info("Document cache hit for %s", url)
+                    return document_store
+                del DOC_CACHE[key]
+
+            built_at = time.time()
+            document_store = await _load_persisted_store(url)
+            if document_store is None:
+                document_store = await _build_document_store(url)
+                await _persist_store(url, document_store)
+            else:
+                # A store loaded from disk expires with its files, not a fresh TTL
+                built_at = os.path.getmtime(_persisted_store_path(url))
+
+            DOC_CACHE[key] = (built_at, document_store)
+            while len(DOC_CACHE) > settings.DOC_CACHE_SIZE:
+                DOC_CACHE.popitem(last=False)
+            return document_store
+    finally:
+        # Counting waiters as well as the holder: a released lock looks free before its next
+        # waiter acquires it, and replacing it then would let a third request build concurrently
+        _DOC_CACHE_LOCK_USERS[key] -= 1
+        if not _DOC_CACHE_LOCK_USERS[key]:
+            del _DOC_CACHE_LOCK_USERS[key]
+            del _DOC_CACHE_LOCKS[key]
+
+
+def _persisted_store_path(url: str) -> str:
+    """On-disk location of a document's embeddings, keyed on the embedding model and URL"""
+    digest = hashlib.sha1(f"{VECTOR_STORE.model_name}|{url}".encode('utf-8')).hexdigest()
+    return os.path.join(settings.VECTOR_CACHE_DIR, digest)
+
+
+async def _load_persisted_store(url: str):
+    """Load a document's vector store persisted by an earlier request, if it is still fresh"""
+    if not settings.CACHE_ENABLED:
+        return None
+    path = _persisted_store_path(url)
+    try:
+        if not os.path.isdir(path) or time.time() - os.path.getmtime(path) > settings.CACHE_TTL_SECONDS:
+            return None
+        document_store = await asyncio.get_running_loop().run_in_executor(None, VectorStore.load, path)
+        if document_store is not None:
+            logger.info("Loaded persisted vector store for %s", url)
+        return document_store
+    except Exception as e:
+        logger.warning("Failed to load persisted vector store, rebuilding: %s", e)
+        return None
+
+
+def _prune_persisted_stores():
+    """Delete persisted stores (and abandoned temporary directories) older than the cache TTL"""
+    cutoff = time.time() - settings.CACHE_TTL_SECONDS
+    with os.scandir(settings.VECTOR_CACHE_DIR) as entries:
+        for entry in entries:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _save_store(url: str, document_store: VectorStore):
+    _prune_persisted_stores()
+    document_store.save(_persisted_store_path(url))
+
+
+async def _persist_store(url: str, document_store: VectorStore):
+    """Write a freshly built vector store to disk so later processes can skip re-embedding"""
+    if not settings.CACHE_ENABLED:
+        return
+    try:
+        os.makedirs(settings.VECTOR_CACHE_DIR, exist_ok=True)
+        await asyncio.get_running_loop().run_in_executor(None, _save_store, url, document_store)
+    except Exception as e:
+        logger.warning("Failed to persist vector store: %s", e)
+
+
+async def _index_pages(pages: Iterable[Tuple[str, int]], document_store: VectorStore) -> int:
+    """
+    Extract -> chunk -> embed pipeline connected by asyncio queues
+
+    Extraction and embedding run in executor threads, so embedding one batch
+    overlaps with extracting the next pages. Returns the number of chunks indexed.
+    """
+    loop = asyncio.get_running_loop()
+    queue_extract: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    queue_chunks: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+    async def extract():
+        iterator = iter(pages)
+        while True:
+            item = await loop.run_in_executor(_EXTRACT_EXECUTOR, next, iterator, _PIPELINE_DONE)
+            if item is _PIPELINE_DONE:
+                break
+            await queue_extract.put(item)
+        await queue_extract.put(_PIPELINE_DONE)
+
+    async def chunk():
+        while True:
+            item = await queue_extract.get()
+            if item is _PIPELINE_DONE:
+                break
+            text, page_num = item
+            chunks = DOC_LOADER.chunk_text(text, settings.MAX_CHUNK_SIZE, settings.CHUNK_OVERLAP)
+            await queue_chunks.put((chunks, page_num))
+        await queue_chunks.put(_PIPELINE_DONE)
+
+    async def embed() -> int:
+        total = 0
+        batch_chunks = []
+        batch_metadata = []
+        # One shared metadata dict per page, referenced by all of that page's chunks
+        page_meta_cache: Dict[int, dict] = {}
+        while True:
+            item = await queue_chunks.get()
+            if item is not _PIPELINE_DONE:
+                chunks, page_num = item
+                meta = page_meta_cache.setdefault(page_num, {'page': page_num, 'source': 'document'})
+                batch_chunks.extend(chunks)
+                batch_metadata.extend([meta] * len(chunks))
+            if batch_chunks and (len(batch_chunks) >= settings.EMBEDDING_BATCH_SIZE or item is _PIPELINE_DONE):
+                await loop.run_in_executor(None, document_store.add_documents, batch_chunks, batch_metadata)
+                total += len(batch_chunks)
+                batch_chunks, batch_metadata = [], []
+            if item is _PIPELINE_DONE:
+                return total
+
+    tasks = [asyncio.create_task(extract()), asyncio.create_task(chunk()), asyncio.create_task(embed())]
+    try:
+        _, _, total = await asyncio.gather(*tasks)
+    except BaseException:
+        # A failed stage would leave the others blocked on their queues
+        for task in tasks:
+            task.cancel()
+        raise
+    return total
+
+
+async def _build_document_store(url: str) -> VectorStore:
+    """Download, extract, chunk and index a document"""
+    # Pick the loader from the URL path's extension (query string and fragment ignored)
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    loader = _LOADERS.get(ext)
+    if loader is None:
+        raise HTTPException(status_code=400, detail=f"Unsupported document format. Please use PDF or DOCX. Detected extension: {ext or 'none'}")
+
+    # Download and process document
+    logger.info("Downloading document from: %s", url)
+    doc_content = await DOC_LOADER.download_document(url)
+
+    # IMPORTANT: Each document gets its own vector store, cached by URL in DOC_CACHE.
+    # The global VECTOR_STORE is used as a template for its model, but not for storing document data.
+    document_store = VectorStore()
+    
+    # Extract text
+    try:
+        logger.info("Processing %s document, size: %d bytes", ext[1:].upper(), len(doc_content))
+        # Larger PDFs come back as a page generator and are consumed incrementally below.
+        # The loader opens the document, so it runs on the extraction thread like the generator
+        text_chunks = await asyncio.get_running_loop().run_in_executor(_EXTRACT_EXECUTOR, loader, doc_content)
+
+        # Chunk and embed pages while later pages are still being extracted
+        logger.info("Starting text chunking process...")
+        total_chunks = await _index_pages(text_chunks, document_store)
+
+        if not total_chunks:
+            logger.error("No text chunks extracted from document - document may be empty or corrupted")
+            raise HTTPException(status_code=400, detail="No text could be extracted from the document. The document may be empty, corrupted, or contain only images.")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Document processing failed: %s", e)
+        raise HTTPException(status_code=400, detail=f"Document processing failed: {str(e)}")
+
+    logger.info("Vector store populated with %d text chunks", total_chunks)
+    return document_store
+
+
 # ==============================================================================
 
+def _normalize_question(question: str) -> str:
+    """Key used to detect duplicate questions within one request"""
+    return ' '.join(question.lower().split())
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -55,113 +305,139 @@ async def process_queries(request: QueryRequest):
     start_time = time.time()
     
     try:
-        logger.info(f"Processing request with {len(request.questions)} questions")
+        logger.info("Processing request with %d questions", len(request.questions))
 
         # Check if services were initialized correctly
         if not all([DOC_LOADER, QUERY_PARSER, VECTOR_STORE, LOGIC_EVALUATOR, CLAUSE_MATCHER]):
             logger.error("One or more services failed to initialize. Cannot process request.")
             raise HTTPException(status_code=503, detail="A core service is unavailable. Please try again later.")
+
+        # Collapse duplicate questions so each distinct one runs through the pipeline once
+        unique_questions: Dict[str, str] = {}
+        positions: Dict[str, List[int]] = defaultdict(list)
+        for i, question in enumerate(request.questions):
+            key = _normalize_question(question)
+            unique_questions.setdefault(key, question)
+            positions[key].append(i)
+        questions = list(unique_questions.values())
+        if len(questions) < len(request.questions):
+            logger.info("Deduplicated %d questions to %d unique", len(request.questions), len(questions))
+
+        def _fan_out(unique_answers: List[str]) -> List[str]:
+            """Map answers for unique questions back to every original position"""
+            all_answers = [None] * len(request.questions)
+            for key, answer in zip(unique_questions, unique_answers):
+                for i in positions[key]:
+                    all_answers[i] = answer
+            return all_answers
+
+        # Serve repeated (document, question) pairs from the cache before touching the document
+        # (the cache encodes questions and hits SQLite, so it runs off the event loop)
+        loop = asyncio.get_running_loop()
+        answers = [None] * len(questions)
+        question_embeddings = [None] * len(questions)
+        if SEMANTIC_CACHE:
+            try:
+                answers, question_embeddings = await loop.run_in_executor(
+                    None, SEMANTIC_CACHE.get_many, request.documents, questions
+                )
+            except Exception as e:
+                logger.warning("Semantic cache lookup failed: %s", e)
+
+        pending = [i for i, answer in enumerate(answers) if answer is None]
+        if not pending:
+            logger.info("All answers served from cache")
+            return EnhancedResponseBuilder.build_simple_response(_fan_out(answers))
         
-        # Download and process document
-        logger.info(f"Downloading document from: {request.documents}")
-        doc_content = await DOC_LOADER.download_document(request.documents)
-        
-        # Determine document type and extract text
-        try:
-            # Extract the base URL without query parameters for type detection
-            base_url = request.documents.split('?')[0].lower()
-            
-            if base_url.endswith('.pdf'):
-                logger.info(f"Processing PDF document, size: {len(doc_content)} bytes")
-                text_chunks = DOC_LOADER.extract_text_from_pdf(doc_content)
-                logger.info(f"Extracted {len(text_chunks) if text_chunks else 0} text chunks from PDF")
-            elif base_url.endswith('.docx'):
-                logger.info(f"Processing DOCX document, size: {len(doc_content)} bytes")
-                text_chunks = DocumentLoader.extract_text_from_docx(doc_content)  # Keep static for DOCX
-                logger.info(f"Extracted {len(text_chunks) if text_chunks else 0} text chunks from DOCX")
-            else:
-                raise HTTPException(status_code=400, detail=f"Unsupported document format. Please use PDF or DOCX. Detected URL: {base_url}")
-            
-            if not text_chunks:
-                logger.error("No text chunks extracted from document - document may be empty or corrupted")
-                raise HTTPException(status_code=400, detail="No text could be extracted from the document. The document may be empty, corrupted, or contain only images.")
-                
-        except HTTPException:
-            raise
-        except Exception as e:
-            logger.error(f"Document processing failed: {str(e)}")
-            raise HTTPException(status_code=400, detail=f"Document processing failed: {str(e)}")
-        
-        # Process text chunks
-        all_chunks = []
-        chunk_metadata = []
-        
-        logger.info("Starting text chunking process...")
-        for text, page_num in text_chunks:
-            chunks = DOC_LOADER.chunk_text(text, settings.MAX_CHUNK_SIZE, settings.CHUNK_OVERLAP)
-            all_chunks.extend(chunks)
-            chunk_metadata.extend([{'page': page_num, 'source': 'document'}] * len(chunks))
-        
-        logger.info(f"Created {len(all_chunks)} text chunks")
-        
-        # Add to vector store
-        # IMPORTANT: We create a temporary, request-specific vector store for each document.
-        # The global VECTOR_STORE is used as a template for its model, but not for storing data between requests.
-        request_vector_store = VectorStore()
-        logger.info("Adding documents to request-specific vector store...")
-        request_vector_store.add_documents(all_chunks, chunk_metadata)
-        logger.info("Vector store populated successfully for this request")
+        # Reuse the indexed document if this URL was processed recently
+        request_vector_store = await _get_document_store(request.documents)
 
         # Initialize a clause matcher for this specific request
         request_clause_matcher = ClauseMatcher(request_vector_store)
         
-        # Process each query
-        answers = []
-        
-        logger.info(f"Starting to process {len(request.questions)} queries...")
-        for i, query in enumerate(request.questions):
-            logger.info(f"Processing query {i+1}/{len(request.questions)}: {query[:50]}...")
-            
+        # Queries run concurrently; the Gemini client bounds in-flight calls (MAX_CONCURRENCY)
+        cacheable = set()
+
+        async def _parse(i: int, query: str) -> Dict:
+            logger.info("Processing query %d/%d: %s", i + 1, len(questions), query[:50])
+            return await QUERY_PARSER.parse_query(query)
+
+        async def _evaluate(i: int, query: str, relevant_clauses: List[Dict]) -> str:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Found %d relevant clauses for query %d", len(relevant_clauses), i + 1)
+
+            if not relevant_clauses:
+                logger.warning("No relevant clauses found for query: %s", query)
+                return "No relevant information found in the document for this query."
+
+            # Evaluate clauses (coalesced with concurrent queries into batched Gemini calls)
+            evaluation_result = await LOGIC_EVALUATOR.evaluate_clauses_coalesced(
+                query, relevant_clauses, question_embeddings[i]
+            )
+
+            # Only genuine answers are worth caching, not technical failures
+            if evaluation_result.get('decision') != 'error':
+                cacheable.add(i)
+
+            # Extract answer
+            return evaluation_result.get('answer', 'Unable to find relevant information')
+
+        def _record_failure(i: int, error: Exception):
+            logger.error("Error processing query '%s': %s", questions[i], error)
+            answers[i] = f"Error processing query: {str(error)}"
+
+        logger.info("Starting to process %d queries", len(pending))
+
+        # Parse all queries concurrently; gather preserves input order, so results line up with pending
+        parsed_queries = await asyncio.gather(
+            *[_parse(i, questions[i]) for i in pending],
+            return_exceptions=True
+        )
+        parsed = []
+        for i, parsed_query in zip(pending, parsed_queries):
+            if isinstance(parsed_query, Exception):
+                _record_failure(i, parsed_query)
+            else:
+                parsed.append((i, parsed_query))
+
+        # One batched encode and vector search for every parsed query
+        clause_lists = await request_clause_matcher.find_relevant_clauses_batch(
+            [parsed_query for _, parsed_query in parsed], k=settings.TOP_K_RESULTS
+        )
+
+        results = await asyncio.gather(
+            *[_evaluate(i, questions[i], clauses) for (i, _), clauses in zip(parsed, clause_lists)],
+            return_exceptions=True
+        )
+        for (i, _), result in zip(parsed, results):
+            if isinstance(result, Exception):
+                _record_failure(i, result)
+            else:
+                answers[i] = result
+
+        if SEMANTIC_CACHE and cacheable:
             try:
-                # Parse query
-                logger.info(f"Parsing query {i+1}...")
-                parsed_query = await QUERY_PARSER.parse_query(query)
-                logger.info(f"Query {i+1} parsed successfully")
-                
-                # Find relevant clauses
-                logger.info(f"Finding relevant clauses for query {i+1}...")
-                relevant_clauses = await request_clause_matcher.find_relevant_clauses(
-                    parsed_query, k=settings.TOP_K_RESULTS
+                cached_indices = sorted(cacheable)
+                await loop.run_in_executor(
+                    None,
+                    SEMANTIC_CACHE.set_many,
+                    request.documents,
+                    [questions[i] for i in cached_indices],
+                    [answers[i] for i in cached_indices],
+                    [question_embeddings[i] for i in cached_indices]
                 )
-                logger.info(f"Found {len(relevant_clauses) if relevant_clauses else 0} relevant clauses for query {i+1}")
-                
-                if not relevant_clauses:
-                    logger.warning(f"No relevant clauses found for query: {query}")
-                    answers.append("No relevant information found in the document for this query.")
-                    continue
-                
-                # Evaluate clauses
-                logger.info(f"Evaluating clauses for query {i+1} using Gemini API...")
-                evaluation_result = await LOGIC_EVALUATOR.evaluate_clauses(query, relevant_clauses)
-                logger.info(f"Gemini API evaluation completed for query {i+1}")
-                
-                # Extract answer
-                answer = evaluation_result.get('answer', 'Unable to find relevant information')
-                answers.append(answer)
-                
             except Exception as e:
-                logger.error(f"Error processing query '{query}': {str(e)}")
-                answers.append(f"Error processing query: {str(e)}")
+                logger.warning("Failed to store answers in semantic cache: %s", e)
 
         processing_time = time.time() - start_time
-        logger.info(f"Successfully processed all queries in {processing_time:.2f} seconds")
+        logger.info("Successfully processed all queries in %.2f seconds", processing_time)
         
         # Return simple string answers as required by hackathon format
-        return QueryResponse(answers=answers)
+        return EnhancedResponseBuilder.build_simple_response(_fan_out(answers))
         
     except HTTPException:
         raise
     except Exception as e:
         processing_time = time.time() - start_time
-        logger.error(f"Fatal error after {processing_time:.2f} seconds: {str(e)}")
+        logger.error("Fatal error after %.2f seconds: %s", processing_time, e)
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
\ No newline at end of file
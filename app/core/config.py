@@ -1,12 +1,29 @@
 import os
 from pydantic_settings import BaseSettings
 
+# Caches hold questions, answers and full document text, so they live outside the working
+# directory (app.main serves it at /static)
+CACHE_ROOT = os.path.join(os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "bajaj-hackathon")
+
 class Settings(BaseSettings):
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     BEARER_TOKEN: str = os.getenv("BEARER_TOKEN", "")
     MAX_CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
     TOP_K_RESULTS: int = 5
+    EMBEDDING_BATCH_SIZE: int = 64
+    MAX_CONCURRENCY: int = 5
+    EVAL_BATCH_SIZE: int = 5
+    EVAL_BATCH_WINDOW_MS: int = 30
+    EVAL_CONTEXT_LIMIT: int = 8000
+    EVAL_RESPONSE_BUFFER: int = 500
+    CACHE_ENABLED: bool = True
+    CACHE_DB_PATH: str = os.path.join(CACHE_ROOT, "semantic_cache.db")
+    CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    CACHE_TTL_SECONDS: int = 3600
+    VECTOR_CACHE_DIR: str = os.path.join(CACHE_ROOT, "vectors")
+    DOC_CACHE_SIZE: int = 8
+    VECTOR_QUANTIZE: bool = False
     
     class Config:
         env_file = ".env"
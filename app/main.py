@@ -1,9 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 import os
 from dotenv import load_dotenv
-from app.api.v1.endpoints import router
+from app.api.v1.endpoints import router, warm_up_services
+from app.services.document_loader import close_http_client
+from app.services.gemini_client import close_gemini_client
 from app.utils.logging_config import setup_logging
 
 load_dotenv()
@@ -12,7 +15,8 @@ setup_logging()
 app = FastAPI(
     title="Bajaj Hackathon Query-Retrieval System",
     description="LLM-powered document analysis and decision making",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -29,6 +33,17 @@ app.mount("/static", StaticFiles(directory="."), name="static")
 # Include router without authentication
 app.include_router(router, prefix="/api/v1/hackrx")
 
+@app.on_event("startup")
+async def startup():
+    """Warm up models in each worker before it serves traffic"""
+    await warm_up_services()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Release shared HTTP connections"""
+    await close_http_client()
+    await close_gemini_client()
+
 @app.get("/")
 async def root():
     return {"message": "Bajaj Hackathon API is running", "status": "healthy"}
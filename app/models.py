@@ -2,17 +2,21 @@
 Pydantic models for request and response validation
 """
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class QueryRequest(BaseModel):
     """Request model for hackathon API"""
+    model_config = ConfigDict(extra="ignore")
+
     documents: str
     questions: List[str]
 
 
 class QueryResponse(BaseModel):
     """Response model for hackathon API"""
+    model_config = ConfigDict(extra="ignore")
+
     answers: List[str]
 
 
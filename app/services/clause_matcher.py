@@ -1,79 +1,89 @@
 from typing import List, Dict, Any, Tuple
+from app.utils.keyword_matcher import KeywordClassifier
 import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Monetary amounts, time periods and percentages, found in a single pass (as _KEY_INFO_RE in
+# logic_evaluator). The amount digits sit in a lookahead after the currency marker, so time periods
+# and percentages overlapping them are still found ('Rs 30 days' has both 'Rs 30' and '30 days').
+_KEY_PHRASE_KINDS = ('money', 'time', 'pct')
+_KEY_PHRASE_RE = re.compile(
+    r'(?:Rs\.?|INR|₹)\s*(?=(?P<money>[\d,]+(?:\.\d{2})?))'
+    r'|(?P<time>\d+\s*(?:days?|months?|years?))'
+    r'|(?P<pct>\d+(?:\.\d+)?%)'
+)
+
+# Clause categories in priority order; the first category with any keyword present wins
+_CLAUSE_CATEGORIES = [
+    ('coverage', ['cover', 'coverage', 'benefit']),
+    ('waiting_period', ['waiting', 'period', 'wait']),
+    ('premium', ['premium', 'payment', 'due']),
+    ('exclusion', ['exclude', 'exclusion', 'not covered']),
+    ('amount', ['amount', 'sum', 'limit']),
+]
+_CLAUSE_CLASSIFIER = KeywordClassifier(_CLAUSE_CATEGORIES)
+
 class ClauseMatcher:
     def __init__(self, vector_store):
         self.vector_store = vector_store
 
     async def find_relevant_clauses(self, parsed_query: Dict[str, Any], k: int = 5) -> List[Dict[str, Any]]:
         """Find clauses relevant to the parsed query"""
+        return (await self.find_relevant_clauses_batch([parsed_query], k=k))[0]
+
+    async def find_relevant_clauses_batch(self, parsed_queries: List[Dict[str, Any]], k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Find clauses for several parsed queries with a single batched vector search"""
         try:
-            # Create search query from parsed components
-            search_terms = []
-            
-            if parsed_query.get('keywords'):
-                search_terms.extend(parsed_query['keywords'][:10])
-            
-            if parsed_query.get('entities'):
-                search_terms.extend(parsed_query['entities'])
-            
-            search_query = ' '.join(search_terms) if search_terms else "general policy information"
+            # Create search queries from parsed components
+            search_queries = [self._build_search_query(parsed_query) for parsed_query in parsed_queries]
             
             # Search vector store
-            results = self.vector_store.search(search_query, k=k)
+            all_results = self.vector_store.search_batch(search_queries, k=k)
             
             # Format results
-            clauses = []
-            for text, score, metadata in results:
-                clauses.append({
-                    'text': text,
-                    'relevance_score': score,
-                    'metadata': metadata,
-                    'clause_type': self._classify_clause(text),
-                    'key_phrases': self._extract_key_phrases(text)
-                })
+            all_clauses = []
+            for results in all_results:
+                clauses = []
+                for text, score, metadata in results:
+                    clauses.append({
+                        'text': text,
+                        'relevance_score': score,
+                        'metadata': metadata,
+                        'clause_type': self._classify_clause(text),
+                        'key_phrases': self._extract_key_phrases(text)
+                    })
+                all_clauses.append(clauses)
             
-            logger.info(f"Found {len(clauses)} relevant clauses")
-            return clauses
+            logger.info(f"Found relevant clauses for {len(parsed_queries)} queries")
+            return all_clauses
             
         except Exception as e:
             logger.error(f"Clause matching failed: {e}")
-            return []
+            return [[] for _ in parsed_queries]
+
+    def _build_search_query(self, parsed_query: Dict[str, Any]) -> str:
+        """Join the parsed keywords and entities into a vector search query"""
+        search_terms = []
+        
+        if parsed_query.get('keywords'):
+            search_terms.extend(parsed_query['keywords'][:10])
+        
+        if parsed_query.get('entities'):
+            search_terms.extend(parsed_query['entities'])
+        
+        return ' '.join(search_terms) if search_terms else "general policy information"
 
     def _classify_clause(self, text: str) -> str:
         """Classify clause type based on content"""
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['cover', 'coverage', 'benefit']):
-            return 'coverage'
-        elif any(word in text_lower for word in ['waiting', 'period', 'wait']):
-            return 'waiting_period'
-        elif any(word in text_lower for word in ['premium', 'payment', 'due']):
-            return 'premium'
-        elif any(word in text_lower for word in ['exclude', 'exclusion', 'not covered']):
-            return 'exclusion'
-        elif any(word in text_lower for word in ['amount', 'sum', 'limit']):
-            return 'amount'
-        else:
-            return 'general'
+        return _CLAUSE_CLASSIFIER.classify(text.lower(), default='general')
 
     def _extract_key_phrases(self, text: str) -> List[str]:
-        """Extract key phrases from clause text"""
-        phrases = []
-        
-        # Extract monetary amounts
-        money_pattern = r'(?:Rs\.?|INR|₹)\s*[\d,]+(?:\.\d{2})?'
-        phrases.extend(re.findall(money_pattern, text))
-        
-        # Extract time periods
-        time_pattern = r'\d+\s*(?:days?|months?|years?)'
-        phrases.extend(re.findall(time_pattern, text))
-        
-        # Extract percentages
-        percent_pattern = r'\d+(?:\.\d+)?%'
-        phrases.extend(re.findall(percent_pattern, text))
-        
-        return phrases
+        """Extract key phrases (amounts, time periods, percentages) from clause text"""
+        phrases = {kind: [] for kind in _KEY_PHRASE_KINDS}
+        for match in _KEY_PHRASE_RE.finditer(text):
+            kind = match.lastgroup
+            # An amount spans from its currency marker to the end of the looked-ahead digits
+            phrases[kind].append(text[match.start():match.end(kind)])
+        return [phrase for kind in _KEY_PHRASE_KINDS for phrase in phrases[kind]]
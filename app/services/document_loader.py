@@ -1,17 +1,85 @@
 import aiofiles
 import httpx
+import fitz  # PyMuPDF
 import pdfplumber
 import pypdf
 from docx import Document
-import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import multiprocessing
 import os
-from typing import List, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
 import re
 import io
 import logging
 
 logger = logging.getLogger(__name__)
 
+_PERIOD_RE = re.compile(r'\.')
+
+# Shared HTTP client: keeps TLS connections alive across downloads and multiplexes with HTTP/2.
+# Closed by the application's shutdown hook via close_http_client().
+_CLIENT = httpx.AsyncClient(
+    http2=True,
+    timeout=httpx.Timeout(30.0),
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+)
+
+
+async def close_http_client():
+    """Close the shared download client"""
+    await _CLIENT.aclose()
+
+# Worker pool for parallel PDF page extraction, created on first use.
+# PyMuPDF is not thread-safe, so pages are split across processes rather than threads.
+# Workers are spawned, not forked: forking would copy the server's event loop, HTTP clients,
+# logging queue thread and loaded models into every worker.
+_PAGE_POOL: Optional[ProcessPoolExecutor] = None
+
+# Size-adaptive extraction rules, checked in order (max_pages None = no upper bound).
+#   sequential: extract every page up front and return a list
+#   streaming:  yield pages one at a time so chunking/embedding can start immediately
+#   processes:  split into chunk_size page ranges across the process pool, yielded in order
+PDF_STRATEGY_RULES: Dict[str, Dict[str, Any]] = {
+    'tiny': {'max_pages': 10, 'strategy': 'sequential'},
+    'small': {'max_pages': 50, 'strategy': 'sequential'},
+    'medium': {'max_pages': 200, 'strategy': 'streaming'},
+    'large': {'max_pages': 500, 'strategy': 'streaming'},
+    'xlarge': {'max_pages': None, 'strategy': 'processes', 'chunk_size': 500},
+}
+
+
+def select_pdf_strategy(n_pages: int) -> Tuple[str, Dict[str, Any]]:
+    """Pick the extraction rule for a document with n_pages pages"""
+    for size_class, rule in PDF_STRATEGY_RULES.items():
+        if rule['max_pages'] is None or n_pages <= rule['max_pages']:
+            return size_class, rule
+    raise ValueError(f"No PDF strategy rule covers {n_pages} pages")
+
+
+def _get_page_pool() -> ProcessPoolExecutor:
+    global _PAGE_POOL
+    if _PAGE_POOL is None:
+        _PAGE_POOL = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+    return _PAGE_POOL
+
+
+def _extract_pages(doc, start: int, stop: int) -> List[Tuple[str, int]]:
+    """Extract text for pages [start, stop) of an open PyMuPDF document"""
+    texts = []
+    for page_num in range(start, stop):
+        text = doc[page_num].get_text("text")
+        if text and text.strip():
+            texts.append((text.strip(), page_num + 1))
+    return texts
+
+
+def _extract_page_range(content: bytes, start: int, stop: int) -> List[Tuple[str, int]]:
+    """Open the PDF and extract pages [start, stop) (runs inside a worker process)"""
+    with fitz.open(stream=content, filetype="pdf") as doc:
+        return _extract_pages(doc, start, stop)
+
 class DocumentLoader:
     def __init__(self):
         # Check if we should use local/fast mode for testing (disabled for production)
@@ -24,54 +92,98 @@ class DocumentLoader:
         if self.use_local_mode:
             logger.info(f"DocumentLoader: Using local mode (max {self.max_pages_local} pages)")
         elif self.hackathon_mode:
-            logger.info(f"DocumentLoader: Using hackathon mode (max {self.max_pages_hackathon} pages for speed)")
+            logger.info(f"DocumentLoader: Using hackathon mode (fallback parsers capped at {self.max_pages_hackathon} pages for speed)")
         else:
             logger.info("DocumentLoader: Using production mode (full document processing)")
     @staticmethod
     async def download_document(url: str) -> bytes:
         """Download document from URL"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(url)
-                response.raise_for_status()
-                logger.info(f"Successfully downloaded document from {url}")
-                return response.content
+            response = await _CLIENT.get(url)
+            response.raise_for_status()
+            logger.info(f"Successfully downloaded document from {url}")
+            return response.content
         except Exception as e:
             logger.error(f"Failed to download document from {url}: {str(e)}")
             raise
 
+    def extract_text_from_pdf_fitz(self, content: bytes) -> Iterable[Tuple[str, int]]:
+        """
+        Extract text from PDF using PyMuPDF with a strategy chosen by page count
+
+        Small documents return a list; larger ones return a generator of
+        (text, page_num) so callers can consume pages as they are extracted.
+        """
+        with fitz.open(stream=content, filetype="pdf") as doc:
+            n_pages = doc.page_count
+
+            # Local testing still caps pages; every other mode reads the whole document
+            mode_info = ""
+            if self.use_local_mode:
+                n_pages = min(n_pages, self.max_pages_local)
+                mode_info = f" (local mode - first {n_pages} pages)"
+
+            size_class, rule = select_pdf_strategy(n_pages)
+            logger.info(f"PDF has {n_pages} pages ({size_class}), using {rule['strategy']} extraction{mode_info}")
+
+            if rule['strategy'] == 'sequential':
+                texts = _extract_pages(doc, 0, n_pages)
+                logger.info(f"Extracted text from {len(texts)} pages using PyMuPDF")
+                return texts
+
+        if rule['strategy'] == 'streaming':
+            return self._stream_pdf_pages(content, n_pages)
+        return self._stream_pdf_page_ranges(content, n_pages, rule['chunk_size'])
+
+    @staticmethod
+    def _stream_pdf_pages(content: bytes, n_pages: int) -> Iterator[Tuple[str, int]]:
+        """Yield (text, page_num) one page at a time"""
+        with fitz.open(stream=content, filetype="pdf") as doc:
+            for page_num in range(n_pages):
+                text = doc[page_num].get_text("text")
+                if text and text.strip():
+                    yield text.strip(), page_num + 1
+
+    @staticmethod
+    def _stream_pdf_page_ranges(content: bytes, n_pages: int, chunk_size: int) -> Iterator[Tuple[str, int]]:
+        """Extract chunk_size page ranges in worker processes, yielding results in page order"""
+        pool = _get_page_pool()
+        futures = [
+            pool.submit(_extract_page_range, content, start, min(start + chunk_size, n_pages))
+            for start in range(0, n_pages, chunk_size)
+        ]
+        for future in futures:
+            yield from future.result()
+
     def extract_text_from_pdf_pdfplumber(self, content: bytes) -> List[Tuple[str, int]]:
         """Extract text from PDF using pdfplumber"""
         texts = []
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            tmp_file.write(content)
-            tmp_file.flush()
-            
-            try:
-                with pdfplumber.open(tmp_file.name) as pdf:
-                    # Determine max pages to process based on mode
-                    if self.use_local_mode:
-                        max_pages = self.max_pages_local
-                        mode_info = f" (local mode - first {max_pages} pages)"
-                    elif self.hackathon_mode:
-                        max_pages = self.max_pages_hackathon
-                        mode_info = f" (hackathon mode - first {max_pages} pages)"
-                    else:
-                        max_pages = len(pdf.pages)
-                        mode_info = ""
-                    
-                    for page_num, page in enumerate(pdf.pages[:max_pages]):
-                        text = page.extract_text()
-                        if text and text.strip():
-                            texts.append((text.strip(), page_num + 1))
-                    logger.info(f"Extracted text from {len(texts)} pages using pdfplumber{mode_info}")
-                return texts
-            except Exception as e:
-                logger.warning(f"pdfplumber failed: {e}, trying pypdf")
-                return self.extract_text_from_pdf_pypdf(content)
-            finally:
-                os.unlink(tmp_file.name)
+        try:
+            with pdfplumber.open(io.BytesIO(content)) as pdf:
+                # Determine max pages to process based on mode
+                if self.use_local_mode:
+                    max_pages = self.max_pages_local
+                    mode_info = f" (local mode - first {max_pages} pages)"
+                elif self.hackathon_mode:
+                    max_pages = self.max_pages_hackathon
+                    mode_info = f" (hackathon mode - first {max_pages} pages)"
+                else:
+                    max_pages = len(pdf.pages)
+                    mode_info = ""
+                
+                for page_num, page in enumerate(islice(pdf.pages, max_pages)):
+                    # Plain text flow only: no layout reconstruction or table detection
+                    text = page.extract_text(x_tolerance=1.5, y_tolerance=1.5, layout=False)
+                    # Release parsed character objects before moving to the next page
+                    page.flush_cache()
+                    if text and text.strip():
+                        texts.append((text.strip(), page_num + 1))
+                logger.info(f"Extracted text from {len(texts)} pages using pdfplumber{mode_info}")
+            return texts
+        except Exception as e:
+            logger.warning(f"pdfplumber failed: {e}, trying pypdf")
+            return self.extract_text_from_pdf_pypdf(content)
 
     def extract_text_from_pdf_pypdf(self, content: bytes) -> List[Tuple[str, int]]:
         """Extract text from PDF using pypdf (backup method)"""
@@ -99,30 +211,24 @@ class DocumentLoader:
             logger.error(f"pypdf extraction failed: {e}")
             return [("Could not extract text from PDF", 1)]
 
-    def extract_text_from_pdf(self, content: bytes) -> List[Tuple[str, int]]:
+    def extract_text_from_pdf(self, content: bytes) -> Iterable[Tuple[str, int]]:
         """Main PDF extraction method"""
         try:
+            return self.extract_text_from_pdf_fitz(content)
+        except Exception as e:
+            logger.warning(f"PyMuPDF failed: {e}, trying pdfplumber")
             return self.extract_text_from_pdf_pdfplumber(content)
-        except Exception:
-            return self.extract_text_from_pdf_pypdf(content)
 
     @staticmethod
     def extract_text_from_docx(content: bytes) -> List[Tuple[str, int]]:
         """Extract text from DOCX"""
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as tmp_file:
-            tmp_file.write(content)
-            tmp_file.flush()
-            
-            try:
-                doc = Document(tmp_file.name)
-                texts = []
-                for i, paragraph in enumerate(doc.paragraphs):
-                    if paragraph.text.strip():
-                        texts.append((paragraph.text.strip(), i + 1))
-                logger.info(f"Extracted text from {len(texts)} paragraphs from DOCX")
-                return texts
-            finally:
-                os.unlink(tmp_file.name)
+        doc = Document(io.BytesIO(content))
+        texts = []
+        for i, paragraph in enumerate(doc.paragraphs):
+            if paragraph.text.strip():
+                texts.append((paragraph.text.strip(), i + 1))
+        logger.info(f"Extracted text from {len(texts)} paragraphs from DOCX")
+        return texts
 
     @staticmethod
     def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
@@ -130,23 +236,29 @@ class DocumentLoader:
         if len(text) <= chunk_size:
             return [text]
         
+        # Sentence boundary offsets, computed once so each chunk needs only a binary search
+        periods = np.fromiter((m.start() for m in _PERIOD_RE.finditer(text)), dtype=np.int32)
+
         chunks = []
         start = 0
-        while start < len(text):
+        text_len = len(text)
+        while start < text_len:
             end = start + chunk_size
-            if end < len(text):
+            if end < text_len:
                 # Find the last sentence boundary within the chunk
-                last_period = text.rfind('.', start, end)
-                if last_period > start:
-                    end = last_period + 1
+                idx = int(np.searchsorted(periods, end)) - 1
+                if idx >= 0 and periods[idx] > start:
+                    end = int(periods[idx]) + 1
             
             chunk = text[start:end].strip()
             if chunk:
                 chunks.append(chunk)
             
-            if end >= len(text):
+            if end >= text_len:
                 break
-            start = end - overlap
+            # A sentence boundary close to the chunk start would move start backwards
+            # (or nowhere) and loop forever, so always make forward progress
+            start = end - overlap if end - overlap > start else end
         
         logger.info(f"Split text into {len(chunks)} chunks")
         return chunks
\ No newline at end of file
@@ -0,0 +1,52 @@
+import asyncio
+import httpx
+import orjson
+import logging
+from app.core.config import settings
+from app.utils.exceptions import LLMError
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = 'gemini-2.0-flash'
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+
+# One HTTP/2 connection pool for every Gemini call in the process: concurrent questions share
+# multiplexed streams on warm connections instead of paying a TLS handshake each.
+# Closed by the application's shutdown hook via close_gemini_client().
+_CLIENT = httpx.AsyncClient(
+    http2=True,
+    timeout=httpx.Timeout(30.0),
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=32)
+)
+# Bounds Gemini HTTP calls in flight across all requests. Held only around the call itself,
+# so questions waiting on a coalesced batch do not take a permit.
+_SEMAPHORE = asyncio.Semaphore(settings.MAX_CONCURRENCY)
+
+
+async def close_gemini_client():
+    """Close the shared Gemini client"""
+    await _CLIENT.aclose()
+
+
+class GeminiClient:
+    """Minimal async client for the Gemini generateContent REST endpoint"""
+
+    def __init__(self, api_key: str, model: str = GEMINI_MODEL):
+        self.model = model
+        self.url = GEMINI_API_URL.format(model=model)
+        self.headers = {'x-goog-api-key': api_key, 'Content-Type': 'application/json'}
+
+    async def generate_content(self, prompt: str) -> str:
+        """Send a single-turn prompt and return the generated text"""
+        payload = {'contents': [{'parts': [{'text': prompt}]}]}
+        async with _SEMAPHORE:
+            response = await _CLIENT.post(self.url, headers=self.headers, content=orjson.dumps(payload))
+        response.raise_for_status()
+
+        data = orjson.loads(response.content)
+        candidates = data.get('candidates') or []
+        if not candidates:
+            raise LLMError(f"Gemini returned no candidates: {data.get('promptFeedback')}")
+
+        parts = candidates[0].get('content', {}).get('parts', [])
+        return ''.join(part.get('text', '') for part in parts)
@@ -1,13 +1,71 @@
-import google.generativeai as genai
 from app.core.config import settings
-from typing import List, Dict, Any, Optional
-import json
+from app.services.gemini_client import GeminiClient
+from app.utils.keyword_matcher import KeywordClassifier
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import hashlib
 import logging
+import numpy as np
+import orjson
 import re
 import os
 
 logger = logging.getLogger(__name__)
 
+# Indian currency formats, tried in order by _extract_amount_from_text
+_AMOUNT_PATTERNS = [
+    re.compile(r'(?:Rs\.?\s*|INR\s*|₹\s*)(\d+(?:,\d+)*(?:\.\d{2})?)', re.IGNORECASE),  # Rs. 1,00,000
+    re.compile(r'(\d+(?:,\d+)*(?:\.\d{2})?)\s*(?:rupees|rs|inr)', re.IGNORECASE),       # 100000 rupees
+    re.compile(r'(\d+(?:,\d+)*)\s*(?:lakh|lakhs|crore|crores)', re.IGNORECASE)          # 5 lakh
+]
+# Amounts, time periods and percentages for extract_key_information, found in a single pass.
+# The amount digits sit in a lookahead so time periods and percentages overlapping them are
+# still found, as they were with one findall per pattern.
+_KEY_INFO_RE = re.compile(
+    r'(?:Rs\.?\s*|INR\s*|₹\s*)(?=(?P<amount>\d+(?:,\d+)*(?:\.\d{2})?))'
+    r'|(?P<count>\d+)\s*(?P<unit>(?i:days?|months?|years?|weeks?))'
+    r'|(?P<percent>\d+(?:\.\d+)?)\s*%'
+)
+
+# Local-mode query categories in priority order, shared by _classify_query_type and _generate_local_answer
+_QUERY_TYPES = [
+    ('age_verification', ['age', 'year', 'old']),
+    ('medical_coverage', ['surgery', 'treatment', 'medical']),
+    ('policy_inquiry', ['policy', 'insurance', 'coverage']),
+    ('temporal_query', ['time', 'period', 'month']),
+]
+_QUERY_CLASSIFIER = KeywordClassifier(_QUERY_TYPES)
+
+# Local-mode answer per query category: the answer is used only if the retrieved text has supporting keywords
+_LOCAL_ANSWER_TEMPLATES = {
+    'age_verification': (['age', 'year'], "Based on the document analysis, the age-related information shows: {excerpt}..."),
+    'medical_coverage': (['surgery', 'treatment', 'medical', 'hospital'], "Regarding medical/surgery coverage: {excerpt}..."),
+    'policy_inquiry': (['policy', 'coverage', 'benefit'], "Policy information found: {excerpt}..."),
+    'temporal_query': (['month', 'day', 'year', 'period'], "Time period information: {excerpt}..."),
+}
+
+# Shared instruction preamble for single and batched analysis prompts; only the chunks and
+# questions are interpolated per call. The question itself is filled in by _enhance_with_sources.
+_SYSTEM_PROMPT = """Answer questions about a document using ONLY the numbered chunks provided. Never invent details; if the chunks are insufficient, say so. Reply with valid JSON only, no other text."""
+
+_ANSWER_SCHEMA = """{"answer": "direct answer", "source": "supporting sentence", "confidence": "High|Medium|Low", "decision": "approved|denied|not_applicable|insufficient_info", "amount": number or null, "justification": "reasoning citing chunks", "supporting_chunks": ["C1"], "key_quotes": ["quote"]}"""
+
+# In-memory evaluation results kept for repeated questions over the same retrieved chunks
+EVAL_CACHE_SIZE = 512
+CHUNK_KEY_PREFIX = 64
+
+# Shared placeholder for clauses without metadata; source metadata is read-only once attached to a result
+_EMPTY_METADATA: Dict[str, Any] = {}
+
+
+@lru_cache(maxsize=256)
+def _format_clauses(clause_texts: Tuple[str, ...]) -> str:
+    """Numbered chunk block for a prompt; memoized because batch packing and prompt building format the same clauses"""
+    return '\n'.join(f"[C{i}] {text}" for i, text in enumerate(clause_texts, 1))
+
+
 class EnhancedLogicEvaluator:
     def __init__(self):
         # Check if we should use local/mock mode for fast testing (disabled for production)
@@ -18,10 +76,8 @@ class EnhancedLogicEvaluator:
         if not self.use_local_mode:
             try:
                 if settings.GEMINI_API_KEY:
-                    genai.configure(api_key=settings.GEMINI_API_KEY)
-                    # Use the current Gemini model (gemini-pro is deprecated)
-                    self.model = genai.GenerativeModel('gemini-2.0-flash')
-                    logger.info("Initialized Gemini API for production mode with gemini-1.5-flash")
+                    self.model = GeminiClient(settings.GEMINI_API_KEY)
+                    logger.info(f"Initialized Gemini API for production mode with {self.model.model}")
                 else:
                     logger.warning("No Gemini API key found, falling back to local mode")
                     self.use_local_mode = True
@@ -32,6 +88,16 @@ class EnhancedLogicEvaluator:
         if self.use_local_mode:
             logger.info("Using local/mock mode for fast testing")
 
+        # Coalescing queue for batched evaluation, created lazily inside the running event loop
+        self._batch_queue: Optional[asyncio.Queue] = None
+        self._batch_worker: Optional[asyncio.Task] = None
+        self._batch_tasks = set()
+
+        # Two-tier result cache: exact (query, chunks) key, then similar query embeddings over the same chunks.
+        # Callers pass the question embedding they already computed; without one only the exact tier is used.
+        self._exact_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._semantic_entries: "OrderedDict[str, Tuple[str, np.ndarray]]" = OrderedDict()
+
     async def evaluate_clauses(self, query: str, clauses: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Evaluate clauses against query using structured document analysis approach
@@ -53,15 +119,15 @@ class EnhancedLogicEvaluator:
             # Create structured prompt for document analysis
             analysis_prompt = self._create_analysis_prompt(query, formatted_clauses)
             
-            # Get LLM response with timeout
-            response = self.model.generate_content(analysis_prompt)
-            json_str = self._clean_json_response(response.text)
+            # Get LLM response
+            response_text = await self.model.generate_content(analysis_prompt)
+            json_str = self._clean_json_response(response_text)
             
             # Parse and validate response
-            result = json.loads(json_str)
+            result = orjson.loads(json_str)
             
             # Enhance with source information
-            result = self._enhance_with_sources(result, clauses)
+            result = self._enhance_with_sources(result, query, clauses)
             
             # Validate response structure
             result = self._validate_response_structure(result, query)
@@ -73,64 +139,245 @@ class EnhancedLogicEvaluator:
             logger.error(f"Document analysis failed: {str(e)}")
             return self._create_error_response(query, str(e))
 
+    async def evaluate_clauses_coalesced(self, query: str, clauses: List[Dict[str, Any]],
+                                         query_embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """
+        Queue a query for batched evaluation
+
+        Queries arriving within EVAL_BATCH_WINDOW_MS of each other are packed into a
+        single Gemini call; the caller awaits only its own result. query_embedding is the
+        normalized question embedding used by the semantic result cache.
+        """
+        if self.use_local_mode:
+            return await self.evaluate_clauses(query, clauses)
+
+        cache_enabled = settings.CACHE_ENABLED
+        if cache_enabled:
+            exact_key, chunk_key = self._cache_keys(query, clauses)
+            cached = self._exact_cache.get(exact_key)
+            if cached is not None:
+                self._exact_cache.move_to_end(exact_key)
+                logger.info("Evaluation cache hit (exact)")
+                return dict(cached)
+
+            cached = self._semantic_lookup(chunk_key, query_embedding)
+            if cached is not None:
+                logger.info("Evaluation cache hit (semantic)")
+                return {**cached, 'question': query}
+
+        if settings.EVAL_BATCH_SIZE <= 1:
+            result = await self.evaluate_clauses(query, clauses)
+        else:
+            self._ensure_batch_worker()
+            future = asyncio.get_running_loop().create_future()
+            await self._batch_queue.put((query, clauses, future))
+            result = await future
+
+        if cache_enabled and result.get('decision') != 'error':
+            self._cache_store(exact_key, chunk_key, query_embedding, result)
+        return result
+
+    @staticmethod
+    def _cache_keys(query: str, clauses: List[Dict[str, Any]]) -> Tuple[str, str]:
+        """Exact key over (query, retrieved chunks) and the chunk-only key that scopes semantic hits"""
+        chunk_key = hashlib.sha1(
+            ''.join(sorted(clause['text'][:CHUNK_KEY_PREFIX] for clause in clauses)).encode('utf-8')
+        ).hexdigest()
+        exact_key = hashlib.sha1(f"{query}||{chunk_key}".encode('utf-8')).hexdigest()
+        return exact_key, chunk_key
+
+    def _semantic_lookup(self, chunk_key: str, embedding: Optional[np.ndarray]) -> Optional[Dict[str, Any]]:
+        """Most similar cached query evaluated over the same chunks, above the similarity threshold"""
+        if embedding is None:
+            return None
+        candidates = [
+            (exact_key, stored) for exact_key, (stored_chunk_key, stored) in self._semantic_entries.items()
+            if stored_chunk_key == chunk_key
+        ]
+        if not candidates:
+            return None
+
+        similarities = np.vstack([stored for _, stored in candidates]) @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < settings.CACHE_SIMILARITY_THRESHOLD:
+            return None
+        exact_key = candidates[best][0]
+        self._exact_cache.move_to_end(exact_key)
+        return self._exact_cache[exact_key]
+
+    def _cache_store(self, exact_key: str, chunk_key: str, embedding: Optional[np.ndarray], result: Dict[str, Any]):
+        self._exact_cache[exact_key] = dict(result)
+        self._exact_cache.move_to_end(exact_key)
+        if embedding is not None:
+            self._semantic_entries[exact_key] = (chunk_key, embedding)
+        while len(self._exact_cache) > EVAL_CACHE_SIZE:
+            evicted_key, _ = self._exact_cache.popitem(last=False)
+            self._semantic_entries.pop(evicted_key, None)
+
+    async def evaluate_clauses_batch(self, questions: List[str], per_question_clauses: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Evaluate several questions with one multi-question Gemini call"""
+        if self.use_local_mode or len(questions) == 1:
+            return list(await asyncio.gather(*[
+                self.evaluate_clauses(query, clauses)
+                for query, clauses in zip(questions, per_question_clauses)
+            ]))
+
+        batch_prompt = self._create_batch_analysis_prompt(
+            questions, [self._format_clauses_for_analysis(clauses) for clauses in per_question_clauses]
+        )
+
+        # Split the batch in half if the packed prompt would overflow the context window
+        if self._estimate_tokens(batch_prompt) > self._batch_token_budget(len(questions)):
+            logger.info(f"Batch of {len(questions)} questions exceeds token budget, splitting")
+            middle = len(questions) // 2
+            halves = await asyncio.gather(
+                self.evaluate_clauses_batch(questions[:middle], per_question_clauses[:middle]),
+                self.evaluate_clauses_batch(questions[middle:], per_question_clauses[middle:])
+            )
+            return halves[0] + halves[1]
+
+        try:
+            response_text = await self.model.generate_content(batch_prompt)
+            parsed = orjson.loads(self._clean_json_response(response_text, closing=']'))
+            answers_by_id = {int(item['id']): item for item in parsed if isinstance(item, dict) and 'id' in item}
+        except Exception as e:
+            logger.warning(f"Batched analysis failed, evaluating individually: {e}")
+            answers_by_id = {}
+
+        results = []
+        missing = []
+        for i, (query, clauses) in enumerate(zip(questions, per_question_clauses), 1):
+            result = answers_by_id.get(i)
+            if result is None:
+                missing.append(len(results))
+                results.append(None)
+                continue
+            result.pop('id', None)
+            result = self._enhance_with_sources(result, query, clauses)
+            results.append(self._validate_response_structure(result, query))
+
+        # Any question the model skipped gets its own call
+        if missing:
+            retried = await asyncio.gather(*[
+                self.evaluate_clauses(questions[idx], per_question_clauses[idx]) for idx in missing
+            ])
+            for idx, result in zip(missing, retried):
+                results[idx] = result
+
+        logger.info(f"Batch analyzed {len(questions)} questions in one call ({len(missing)} retried individually)")
+        return results
+
+    def _ensure_batch_worker(self):
+        """Start the coalescing worker on first use"""
+        if self._batch_worker is None or self._batch_worker.done():
+            self._batch_queue = asyncio.Queue()
+            self._batch_worker = asyncio.create_task(self._run_batch_worker())
+
+    async def _run_batch_worker(self):
+        """Collect queued queries for a short window, then dispatch them as batches"""
+        loop = asyncio.get_running_loop()
+        window = settings.EVAL_BATCH_WINDOW_MS / 1000
+
+        while True:
+            batch = [await self._batch_queue.get()]
+            deadline = loop.time() + window
+            while len(batch) < settings.EVAL_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._batch_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Dispatch without blocking collection of the next batch
+            task = asyncio.create_task(self._dispatch_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _dispatch_batch(self, batch: List[tuple]):
+        """Split a coalesced batch by token budget and resolve each caller's future"""
+        groups = []
+        current = []
+        for item in batch:
+            # Size the candidate group by the prompt it would actually produce, so the
+            # budget check in evaluate_clauses_batch accepts every group packed here
+            candidate = current + [item]
+            if current and self._batch_prompt_tokens(candidate) > self._batch_token_budget(len(candidate)):
+                groups.append(current)
+                candidate = [item]
+            current = candidate
+        if current:
+            groups.append(current)
+
+        async def _run_group(group: List[tuple]):
+            try:
+                results = await self.evaluate_clauses_batch([q for q, _, _ in group], [c for _, c, _ in group])
+                for (_, _, future), result in zip(group, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                for _, _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+
+        await asyncio.gather(*[_run_group(group) for group in groups])
+
+    def _batch_prompt_tokens(self, items: List[tuple]) -> int:
+        """Estimated tokens of the batched prompt for queued (query, clauses, future) items"""
+        return self._estimate_tokens(self._create_batch_analysis_prompt(
+            [query for query, _, _ in items],
+            [self._format_clauses_for_analysis(clauses) for _, clauses, _ in items]
+        ))
+
+    def _batch_token_budget(self, n_questions: int) -> int:
+        """Input tokens available once each question's response buffer is reserved"""
+        return settings.EVAL_CONTEXT_LIMIT - settings.EVAL_RESPONSE_BUFFER * n_questions
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token estimate (~4 characters per token)"""
+        return len(text) // 4
+
+    async def ping(self):
+        """Issue a trivial Gemini call so connection setup happens before the first request"""
+        if self.use_local_mode:
+            return
+        try:
+            await self.model.generate_content("Reply with OK.")
+            logger.info("Gemini API warm-up call succeeded")
+        except Exception as e:
+            logger.warning(f"Gemini API warm-up call failed: {e}")
+
     def _format_clauses_for_analysis(self, clauses: List[Dict[str, Any]]) -> str:
-        """Format clauses with proper numbering and context"""
-        formatted_chunks = []
-        
-        for i, clause in enumerate(clauses, 1):
-            chunk_text = clause['text']
-            metadata = clause.get('metadata', {})
-            relevance = clause.get('relevance_score', 0.0)
-            
-            formatted_chunk = f"""
-**Chunk {i}** (Relevance: {relevance:.2f})
-{chunk_text}
----
-"""
-            formatted_chunks.append(formatted_chunk)
-        
-        return '\n'.join(formatted_chunks)
+        """Format clauses as numbered [C{i}] lines"""
+        return _format_clauses(tuple(clause['text'] for clause in clauses))
 
     def _create_analysis_prompt(self, query: str, formatted_clauses: str) -> str:
         """Create structured prompt for document analysis"""
-        return f"""
-You are an intelligent document analysis assistant. Your role is to analyze document chunks and answer questions based ONLY on the provided content.
+        # Invariant instructions first and the question last, so repeated calls share the longest
+        # possible prefix for provider-side prompt caching
+        return f"""{_SYSTEM_PROMPT}
+Return one JSON object:
+{_ANSWER_SCHEMA}
+<DOCUMENT>
+{formatted_clauses}
+</DOCUMENT>
+<QUESTION>{query}</QUESTION>"""
 
-**STRICT INSTRUCTIONS:**
-1. Read and understand the document chunks carefully
-2. Answer the question using ONLY information from the provided chunks
-3. Never hallucinate or invent details not in the document
-4. If information is insufficient, clearly state that
-5. Provide precise citations from the chunks
+    def _create_batch_analysis_prompt(self, questions: List[str], formatted_clauses_list: List[str]) -> str:
+        """Create a single prompt covering several numbered questions"""
+        question_blocks = '\n'.join(
+            f"<DOCUMENT id=\"{i}\">\n{formatted_clauses}\n</DOCUMENT>\n<QUESTION id=\"{i}\">{query}</QUESTION>"
+            for i, (query, formatted_clauses) in enumerate(zip(questions, formatted_clauses_list), 1)
+        )
 
-**USER QUESTION:** "{query}"
+        return f"""{_SYSTEM_PROMPT}
+Answer each QUESTION using only the DOCUMENT chunks with the same id. Return a JSON array with one object per question, each with its "id" number plus:
+{_ANSWER_SCHEMA}
+{question_blocks}"""
 
-**DOCUMENT CHUNKS:**
-{formatted_clauses}
-
-**ANALYSIS REQUIREMENTS:**
-- Provide a direct, factual answer based only on the document content
-- Identify which specific chunks support your answer
-- Determine confidence level based on clarity of information
-- Include relevant citations/quotes from the chunks
-
-**RESPONSE FORMAT (JSON only):**
-{{
-    "question": "{query}",
-    "answer": "Direct answer based only on document content",
-    "source": "Specific chunk or sentence that supports the answer",
-    "confidence": "High/Medium/Low",
-    "decision": "approved/denied/not_applicable/insufficient_info",
-    "amount": numeric_value_or_null,
-    "justification": "Clear explanation referencing specific chunks",
-    "supporting_chunks": ["Chunk 1", "Chunk 2"],
-    "key_quotes": ["Relevant quote from document"]
-}}
-
-**IMPORTANT:** Return only valid JSON. No additional text or commentary.
-"""
-
-    def _clean_json_response(self, response_text: str) -> str:
+    def _clean_json_response(self, response_text: str, closing: str = '}') -> str:
         """Clean and extract JSON from LLM response"""
         json_str = response_text.strip()
         
@@ -142,8 +389,8 @@ You are an intelligent document analysis assistant. Your role is to analyze docu
         
         # Remove any trailing text after JSON
         try:
-            # Find the last closing brace
-            last_brace = json_str.rfind('}')
+            # Find the last closing brace (or bracket for batched array responses)
+            last_brace = json_str.rfind(closing)
             if last_brace != -1:
                 json_str = json_str[:last_brace + 1]
         except:
@@ -151,13 +398,16 @@ You are an intelligent document analysis assistant. Your role is to analyze docu
         
         return json_str.strip()
 
-    def _enhance_with_sources(self, result: Dict[str, Any], clauses: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Enhance response with detailed source information"""
-        # Add full source clauses
-        result['source_clauses'] = [clause['text'] for clause in clauses[:3]]
+    def _enhance_with_sources(self, result: Dict[str, Any], query: str, clauses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Enhance response with the question and detailed source information"""
+        result['question'] = query
+
+        # Add full source clauses (references to the matched clauses' data, not copies)
+        top_clauses = clauses[:3]
+        result['source_clauses'] = [clause['text'] for clause in top_clauses]
         
         # Add metadata information
-        result['source_metadata'] = [clause.get('metadata', {}) for clause in clauses[:3]]
+        result['source_metadata'] = [clause.get('metadata') or _EMPTY_METADATA for clause in top_clauses]
         
         # Extract and validate amounts from text
         if 'amount' not in result or result['amount'] is None:
@@ -169,15 +419,8 @@ You are an intelligent document analysis assistant. Your role is to analyze docu
 
     def _extract_amount_from_text(self, text: str) -> Optional[float]:
         """Extract monetary amounts from text"""
-        # Pattern for Indian currency formats
-        patterns = [
-            r'(?:Rs\.?\s*|INR\s*|₹\s*)(\d+(?:,\d+)*(?:\.\d{2})?)',  # Rs. 1,00,000
-            r'(\d+(?:,\d+)*(?:\.\d{2})?)\s*(?:rupees|rs|inr)',       # 100000 rupees
-            r'(\d+(?:,\d+)*)\s*(?:lakh|lakhs|crore|crores)'          # 5 lakh
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in _AMOUNT_PATTERNS:
+            match = pattern.search(text)
             if match:
                 amount_str = match.group(1).replace(',', '')
                 try:
@@ -265,26 +508,27 @@ You are an intelligent document analysis assistant. Your role is to analyze docu
             'conditions': []
         }
         
-        # Extract monetary amounts
-        amount_pattern = r'(?:Rs\.?\s*|INR\s*|₹\s*)(\d+(?:,\d+)*(?:\.\d{2})?)'
-        key_info['amounts'] = re.findall(amount_pattern, text)
-        
-        # Extract time periods
-        time_pattern = r'(\d+)\s*(days?|months?|years?|weeks?)'
-        key_info['time_periods'] = re.findall(time_pattern, text, re.IGNORECASE)
-        
-        # Extract percentages
-        percent_pattern = r'(\d+(?:\.\d+)?)\s*%'
-        key_info['percentages'] = re.findall(percent_pattern, text)
+        # Extract monetary amounts, time periods and percentages
+        for match in _KEY_INFO_RE.finditer(text):
+            kind = match.lastgroup
+            if kind == 'amount':
+                key_info['amounts'].append(match.group('amount'))
+            elif kind == 'unit':
+                key_info['time_periods'].append((match.group('count'), match.group('unit')))
+            else:
+                key_info['percentages'].append(match.group('percent'))
         
         # Extract conditions (basic pattern matching)
         condition_keywords = ['if', 'provided', 'subject to', 'condition', 'requirement']
-        for keyword in condition_keywords:
-            if keyword in text.lower():
-                # Extract sentence containing the condition
-                sentences = text.split('.')
-                for sentence in sentences:
-                    if keyword in sentence.lower():
+        text_lower = text.lower()
+        hits = [keyword for keyword in condition_keywords if keyword in text_lower]
+        if hits:
+            # Extract sentences containing each condition, lowering every sentence only once
+            sentences = text.split('.')
+            sentences_lower = [sentence.lower() for sentence in sentences]
+            for keyword in hits:
+                for sentence, sentence_lower in zip(sentences, sentences_lower):
+                    if keyword in sentence_lower:
                         key_info['conditions'].append(sentence.strip())
         
         return key_info
@@ -295,14 +539,10 @@ You are an intelligent document analysis assistant. Your role is to analyze docu
         """
         logger.info(f"Using local mode to evaluate query: {query[:50]}...")
         
-        # Extract relevant text from clauses
-        relevant_text = ""
-        source_pages = []
-        
-        for clause in clauses[:3]:  # Use top 3 most relevant clauses
-            relevant_text += clause.get('content', '') + " "
-            if 'metadata' in clause and 'page' in clause['metadata']:
-                source_pages.append(clause['metadata']['page'])
+        # Extract relevant text from the top 3 most relevant clauses
+        top_clauses = clauses[:3]
+        relevant_text = ' '.join(clause.get('text', '') for clause in top_clauses)
+        source_pages = [clause['metadata']['page'] for clause in top_clauses if 'page' in clause.get('metadata', {})]
         
         # Simple keyword-based analysis for common insurance queries
         answer = self._generate_local_answer(query, relevant_text)
@@ -331,25 +571,13 @@ You are an intelligent document analysis assistant. Your role is to analyze docu
         """
         Generate a simple answer based on keyword matching and text analysis
         """
-        query_lower = query.lower()
         text_lower = relevant_text.lower()
         
-        # Common insurance query patterns
-        if any(keyword in query_lower for keyword in ['age', 'year', 'old']):
-            if 'age' in text_lower or 'year' in text_lower:
-                return f"Based on the document analysis, the age-related information shows: {relevant_text[:200]}..."
-        
-        if any(keyword in query_lower for keyword in ['surgery', 'treatment', 'medical']):
-            if any(keyword in text_lower for keyword in ['surgery', 'treatment', 'medical', 'hospital']):
-                return f"Regarding medical/surgery coverage: {relevant_text[:200]}..."
-        
-        if any(keyword in query_lower for keyword in ['policy', 'insurance', 'coverage']):
-            if any(keyword in text_lower for keyword in ['policy', 'coverage', 'benefit']):
-                return f"Policy information found: {relevant_text[:200]}..."
-        
-        if any(keyword in query_lower for keyword in ['month', 'time', 'period']):
-            if any(keyword in text_lower for keyword in ['month', 'day', 'year', 'period']):
-                return f"Time period information: {relevant_text[:200]}..."
+        # Common insurance query patterns, tried in priority order until the text supports one
+        for query_type in _QUERY_CLASSIFIER.matches(query.lower()):
+            evidence, template = _LOCAL_ANSWER_TEMPLATES[query_type]
+            if any(keyword in text_lower for keyword in evidence):
+                return template.format(excerpt=relevant_text[:200])
         
         # Default response
         return f"Based on the document analysis: {relevant_text[:300]}..."
@@ -358,15 +586,4 @@ You are an intelligent document analysis assistant. Your role is to analyze docu
         """
         Simple query classification for metadata
         """
-        query_lower = query.lower()
-        
-        if any(keyword in query_lower for keyword in ['age', 'year', 'old']):
-            return "age_verification"
-        elif any(keyword in query_lower for keyword in ['surgery', 'treatment', 'medical']):
-            return "medical_coverage"
-        elif any(keyword in query_lower for keyword in ['policy', 'insurance']):
-            return "policy_inquiry"
-        elif any(keyword in query_lower for keyword in ['time', 'period', 'month']):
-            return "temporal_query"
-        else:
-            return "general_inquiry"
\ No newline at end of file
+        return _QUERY_CLASSIFIER.classify(query.lower(), default="general_inquiry")
@@ -1,17 +1,17 @@
-import google.generativeai as genai
 from app.core.config import settings
-import json
+from app.services.gemini_client import GeminiClient
+import orjson
 import re
 from typing import Dict, Any
 import logging
 
 logger = logging.getLogger(__name__)
 
+_WORD_RE = re.compile(r'\b\w+\b')
+
 class QueryParser:
     def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        # Use the current Gemini model (gemini-pro is deprecated)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        self.model = GeminiClient(settings.GEMINI_API_KEY)
 
     async def parse_query(self, query: str) -> Dict[str, Any]:
         """Parse natural language query to extract structured information"""
@@ -30,8 +30,8 @@ class QueryParser:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            json_str = response.text.strip()
+            response_text = await self.model.generate_content(prompt)
+            json_str = response_text.strip()
             
             # Clean JSON response
             if json_str.startswith('```json'):
@@ -39,7 +39,7 @@ class QueryParser:
             elif json_str.startswith('```'):
                 json_str = json_str[3:-3]
             
-            parsed = json.loads(json_str)
+            parsed = orjson.loads(json_str)
             logger.info(f"Successfully parsed query with intent: {parsed.get('intent')}")
             return parsed
         except Exception as e:
@@ -47,7 +47,7 @@ class QueryParser:
             # Fallback parsing
             return {
                 "intent": "general_inquiry",
-                "keywords": re.findall(r'\b\w+\b', query.lower()),
+                "keywords": _WORD_RE.findall(query.lower()),
                 "entities": [],
                 "conditions": [],
                 "time_references": []
@@ -5,7 +5,8 @@ class EnhancedResponseBuilder:
     @staticmethod
     def build_simple_response(answers: List[str]) -> QueryResponse:
         """Build simple response with just answers"""
-        return QueryResponse(answers=answers)
+        # Answers are strings assembled by the endpoint itself, so validation is skipped
+        return QueryResponse.model_construct(answers=answers)
 
     @staticmethod
     def build_detailed_response(evaluation_result: Dict[str, Any]) -> DetailedResponse:
@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import sqlite_vec
+except ImportError:
+    sqlite_vec = None
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    Two-tier answer cache in front of the query pipeline
+
+    1. Exact tier: sha256(document_url + "|" + question) -> answer
+    2. Semantic tier: question embedding with cosine similarity >= threshold,
+       scoped to the same document URL
+
+    Entries older than the TTL are ignored and purged on write.
+    """
+
+    def __init__(self, encoder, db_path: str, similarity_threshold: float = 0.95, ttl_seconds: int = 3600):
+        self.encoder = encoder
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                document TEXT NOT NULL,
+                question TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_document ON answers(document, created_at)")
+        self.conn.commit()
+
+        self.use_sqlite_vec = self._load_vector_extension()
+        logger.info(
+            f"Semantic cache ready at {db_path} "
+            f"({'sqlite-vec' if self.use_sqlite_vec else 'numpy'} similarity, threshold {similarity_threshold})"
+        )
+
+    def _load_vector_extension(self) -> bool:
+        """Load sqlite-vec so similarity is computed inside SQLite; numpy is the fallback"""
+        if sqlite_vec is None or not hasattr(self.conn, 'enable_load_extension'):
+            return False
+        try:
+            self.conn.enable_load_extension(True)
+            sqlite_vec.load(self.conn)
+            self.conn.enable_load_extension(False)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to load sqlite-vec, using numpy similarity: {e}")
+            return False
+
+    @staticmethod
+    def _exact_key(document_url: str, question: str) -> str:
+        return hashlib.sha256(f"{document_url}|{question}".encode('utf-8')).hexdigest()
+
+    def _embed(self, questions: List[str]) -> np.ndarray:
+        embeddings = self.encoder.encode(questions, normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def get_many(self, document_url: str, questions: List[str]) -> Tuple[List[Optional[str]], List[Optional[np.ndarray]]]:
+        """
+        Return cached answers in question order (None for misses) and the question embeddings
+
+        Embeddings are computed for exact-tier misses only (None elsewhere); pass them back
+        to set_many so the same questions are not encoded twice.
+        """
+        answers: List[Optional[str]] = [None] * len(questions)
+        question_embeddings: List[Optional[np.ndarray]] = [None] * len(questions)
+        if not questions:
+            return answers, question_embeddings
+
+        min_created = time.time() - self.ttl_seconds
+
+        with self._lock:
+            for i, question in enumerate(questions):
+                row = self.conn.execute(
+                    "SELECT answer FROM answers WHERE key = ? AND created_at >= ?",
+                    (self._exact_key(document_url, question), min_created)
+                ).fetchone()
+                if row:
+                    answers[i] = row[0]
+
+            misses = [i for i, answer in enumerate(answers) if answer is None]
+            if misses:
+                embeddings = self._embed([questions[i] for i in misses])
+                for i, embedding in zip(misses, embeddings):
+                    question_embeddings[i] = embedding
+                    answers[i] = self._semantic_lookup(document_url, embedding, min_created)
+
+        hits = sum(answer is not None for answer in answers)
+        if hits:
+            logger.info(f"Semantic cache hit for {hits}/{len(questions)} questions")
+        return answers, question_embeddings
+
+    def _semantic_lookup(self, document_url: str, embedding: np.ndarray, min_created: float) -> Optional[str]:
+        """Find the most similar cached question for the same document"""
+        if self.use_sqlite_vec:
+            row = self.conn.execute(
+                """
+                SELECT answer, 1 - vec_distance_cosine(embedding, ?) AS similarity
+                FROM answers
+                WHERE document = ? AND created_at >= ?
+                ORDER BY similarity DESC
+                LIMIT 1
+                """,
+                (embedding.tobytes(), document_url, min_created)
+            ).fetchone()
+            if row and row[1] >= self.similarity_threshold:
+                return row[0]
+            return None
+
+        rows = self.conn.execute(
+            "SELECT answer, embedding FROM answers WHERE document = ? AND created_at >= ?",
+            (document_url, min_created)
+        ).fetchall()
+        if not rows:
+            return None
+
+        stored = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+        norms = np.linalg.norm(stored, axis=1) * np.linalg.norm(embedding)
+        similarities = stored @ embedding / np.maximum(norms, 1e-12)
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return rows[best][0]
+        return None
+
+    def set_many(self, document_url: str, questions: List[str], answers: List[str],
+                 embeddings: Optional[List[Optional[np.ndarray]]] = None):
+        """Store freshly computed answers, reusing question embeddings from get_many where given"""
+        if not questions:
+            return
+
+        now = time.time()
+        if embeddings is None:
+            embeddings = [None] * len(questions)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            embeddings = list(embeddings)
+            for i, embedding in zip(missing, self._embed([questions[i] for i in missing])):
+                embeddings[i] = embedding
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO answers (key, document, question, embedding, answer, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (self._exact_key(document_url, question), document_url, question, embedding.tobytes(), answer, now)
+                    for question, answer, embedding in zip(questions, answers, embeddings)
+                ]
+            )
+            self.conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.conn.commit()
+        logger.info(f"Cached {len(questions)} answers for document")
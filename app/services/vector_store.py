@@ -1,23 +1,85 @@
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from collections import OrderedDict
+from functools import lru_cache
 import numpy as np
-from typing import List, Tuple
+import orjson
+import os
+import shutil
+import torch
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
 import logging
 
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
 logger = logging.getLogger(__name__)
 
+# Models that lose accuracy in fp16 (they need fp32/bf16 activations) stay in full precision on GPU
+_FP32_ONLY_MODELS = ('embeddinggemma',)
+
+# LRU of query embeddings shared by all stores, keyed on (model_name, normalized query).
+# Users ask the same questions repeatedly, and each miss costs a full transformer forward pass.
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+_QUERY_EMBEDDINGS: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+
+# Vectors are held once, as float16: in a FAISS QT_fp16 scalar-quantizer index searched with an
+# exact scan, or in self.embeddings with a NumPy scan when faiss is not installed.
+# Stores with at least HNSW_MIN_VECTORS chunks switch to an HNSW graph over fp16 storage; below
+# that the exact scan is cheaper than building the graph.
+HNSW_MIN_VECTORS = 500
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Rows of float16 embeddings upcast per matrix product in the NumPy fallback search
+FALLBACK_BLOCK_ROWS = 2048
+
+# Optional product-quantized index (settings.VECTOR_QUANTIZE) for stores with at least
+# IVFPQ_MIN_VECTORS chunks: 16 one-byte codes per vector replace the fp16 vectors.
+# FAISS needs 39 training points per PQ centroid, so smaller stores stay on HNSW rather than
+# train an unreliable quantizer.
+IVFPQ_NLIST = 64
+IVFPQ_M = 16
+IVFPQ_NBITS = 8
+IVFPQ_MIN_VECTORS = 39 * 2 ** IVFPQ_NBITS
+IVFPQ_NPROBE = 8
+# Trained (empty) IVFPQ indexes per model; documents clone these instead of retraining
+_IVFPQ_TEMPLATES: Dict[str, "faiss.Index"] = {}
+
+
+def _normalize_query(text: str) -> str:
+    """Lowercase and sort tokens so keyword queries built in any order share a cache entry"""
+    return ' '.join(sorted(text.lower().split()))
+
+
+@lru_cache(maxsize=4)
+def _get_encoder(model_name: str) -> SentenceTransformer:
+    """Load a sentence transformer once per process; every VectorStore for that model shares it"""
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    model = SentenceTransformer(model_name, device=device)
+    if device == 'cuda' and not any(name in model_name.lower() for name in _FP32_ONLY_MODELS):
+        model.half()
+    logger.info(f"Loaded sentence transformer model: {model_name} on {device}")
+    return model
+
+
 class VectorStore:
     def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+        self.model_name = model_name
         try:
-            self.model = SentenceTransformer(model_name)
-            logger.info(f"Loaded sentence transformer model: {model_name}")
+            self.model = _get_encoder(model_name)
         except Exception as e:
             logger.error(f"Failed to load sentence transformer: {e}")
             raise
             
-        self.embeddings = None
+        self.embeddings = None  # float16 vectors, only kept when faiss is not installed
         self.texts = []
         self.metadata = []
+        self.index = None
+        self.index_type = None
 
     def add_documents(self, texts: List[str], metadata: List[dict] = None):
         """Add documents to vector store"""
@@ -26,13 +88,16 @@ class VectorStore:
             
         try:
             # Generate embeddings
-            new_embeddings = self.model.encode(texts, show_progress_bar=False)
+            new_embeddings = self.model.encode(
+                texts,
+                batch_size=settings.EMBEDDING_BATCH_SIZE,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
             
-            # Store embeddings
-            if self.embeddings is None:
-                self.embeddings = new_embeddings
-            else:
-                self.embeddings = np.vstack([self.embeddings, new_embeddings])
+            # encode returns unit-length rows, so a dot product is the cosine similarity
+            new_embeddings = np.asarray(new_embeddings, dtype=np.float32)
             
             # Store texts and metadata
             self.texts.extend(texts)
@@ -40,6 +105,16 @@ class VectorStore:
                 self.metadata.extend(metadata)
             else:
                 self.metadata.extend([{}] * len(texts))
+
+            if faiss is None:
+                # float16 halves the memory and bandwidth of the NumPy scan
+                new_embeddings = new_embeddings.astype(np.float16)
+                if self.embeddings is None:
+                    self.embeddings = new_embeddings
+                else:
+                    self.embeddings = np.vstack([self.embeddings, new_embeddings])
+            else:
+                self._update_index(new_embeddings)
                 
             logger.info(f"Added {len(texts)} documents to vector store")
             
@@ -47,35 +122,212 @@ class VectorStore:
             logger.error(f"Failed to add documents to vector store: {e}")
             raise
 
+    def save(self, directory: str):
+        """
+        Persist the store to a directory
+
+        chunks.jsonl holds the chunk texts with metadata, and the vectors go to index.faiss /
+        index.json (the FAISS index) or, without faiss, to embeddings.npy.
+        """
+        tmp_directory = f"{directory}.tmp-{os.getpid()}"
+        os.makedirs(tmp_directory, exist_ok=True)
+        if self.embeddings is not None:
+            np.save(os.path.join(tmp_directory, 'embeddings.npy'), self.embeddings)
+        with open(os.path.join(tmp_directory, 'chunks.jsonl'), 'wb') as f:
+            for text, metadata in zip(self.texts, self.metadata):
+                f.write(orjson.dumps({'text': text, 'metadata': metadata}) + b'\n')
+        if self.index is not None:
+            faiss.write_index(self.index, os.path.join(tmp_directory, 'index.faiss'))
+            with open(os.path.join(tmp_directory, 'index.json'), 'wb') as f:
+                f.write(orjson.dumps({'index_type': self.index_type}))
+
+        # Swap the finished directory into place so readers never see a partial store
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.replace(tmp_directory, directory)
+
+    @classmethod
+    def load(cls, directory: str, model_name: str = 'all-MiniLM-L6-v2') -> Optional['VectorStore']:
+        """
+        Load a store written by save() for read-only use
+
+        The FAISS index is read with IO_FLAG_MMAP where its type supports it and embeddings.npy
+        is memory-mapped, so searches page data in instead of copying the store. Embeddings saved
+        without faiss are indexed on load; a FAISS index cannot be read without faiss (returns None).
+        """
+        embeddings_path = os.path.join(directory, 'embeddings.npy')
+        chunks_path = os.path.join(directory, 'chunks.jsonl')
+        index_path = os.path.join(directory, 'index.faiss')
+        has_index = faiss is not None and os.path.exists(index_path)
+        if not os.path.exists(chunks_path) or not (has_index or os.path.exists(embeddings_path)):
+            return None
+
+        store = cls(model_name)
+        with open(chunks_path, 'rb') as f:
+            for line in f:
+                chunk = orjson.loads(line)
+                store.texts.append(chunk['text'])
+                store.metadata.append(chunk['metadata'])
+
+        if has_index:
+            store.index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            with open(os.path.join(directory, 'index.json'), 'rb') as f:
+                store.index_type = orjson.loads(f.read())['index_type']
+            if store.index_type == 'hnsw':
+                store.index.hnsw.efSearch = HNSW_EF_SEARCH
+            elif store.index_type == 'ivfpq':
+                store.index.nprobe = IVFPQ_NPROBE
+        elif faiss is not None:
+            store._update_index(np.asarray(np.load(embeddings_path), dtype=np.float32))
+        else:
+            store.embeddings = np.load(embeddings_path, mmap_mode='r')
+
+        n_vectors = store.index.ntotal if store.index is not None else len(store.embeddings)
+        if len(store.texts) != n_vectors:
+            logger.warning(f"Discarding inconsistent persisted vector store at {directory}")
+            return None
+        logger.info(f"Loaded {len(store.texts)} persisted documents from {directory}")
+        return store
+
+    def _update_index(self, new_vectors: np.ndarray):
+        """Add new float32 vectors, first moving to the FAISS index suited to the new store size"""
+        n_vectors = len(self.texts)
+        dim = new_vectors.shape[1]
+
+        if (settings.VECTOR_QUANTIZE and n_vectors >= IVFPQ_MIN_VECTORS
+                and dim % IVFPQ_M == 0 and self.index_type != 'ivfpq'):
+            logger.info(f"Building IVFPQ index for {n_vectors} documents")
+            new_vectors = self._with_indexed_vectors(new_vectors)
+            self.index = self._create_ivfpq_index(new_vectors)
+            self.index_type = 'ivfpq'
+        elif n_vectors >= HNSW_MIN_VECTORS and self.index_type in (None, 'flat'):
+            logger.info(f"Building HNSW index for {n_vectors} documents")
+            new_vectors = self._with_indexed_vectors(new_vectors)
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_fp16, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+            self.index = index
+            self.index_type = 'hnsw'
+        elif self.index is None:
+            self.index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+            self.index_type = 'flat'
+
+        # Embeddings are L2-normalized at encode time, so inner product equals cosine similarity
+        self.index.add(np.ascontiguousarray(new_vectors, dtype=np.float32))
+
+    def _with_indexed_vectors(self, new_vectors: np.ndarray) -> np.ndarray:
+        """Vectors already in the current index (decoded from fp16) followed by new_vectors"""
+        if self.index is None or self.index.ntotal == 0:
+            return new_vectors
+        return np.vstack([self.index.reconstruct_n(0, self.index.ntotal), new_vectors])
+
+    def _create_ivfpq_index(self, training_vectors: np.ndarray) -> "faiss.Index":
+        """Clone this model's trained IVFPQ index, training it on training_vectors the first time"""
+        dim = training_vectors.shape[1]
+        template = _IVFPQ_TEMPLATES.get(self.model_name)
+        if template is None or template.d != dim:
+            quantizer = faiss.IndexFlatIP(dim)
+            template = faiss.IndexIVFPQ(quantizer, dim, IVFPQ_NLIST, IVFPQ_M, IVFPQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+            template.train(np.ascontiguousarray(training_vectors, dtype=np.float32))
+            _IVFPQ_TEMPLATES[self.model_name] = template
+            logger.info(f"Trained IVFPQ quantizer for {self.model_name} on {len(training_vectors)} vectors")
+
+        index = faiss.clone_index(template)
+        index.nprobe = IVFPQ_NPROBE
+        return index
+
+    def _embed_cached(self, texts: List[str]) -> np.ndarray:
+        """Embed search queries, reusing embeddings of previously seen queries and encoding the rest in one batch"""
+        keys = [(self.model_name, _normalize_query(text)) for text in texts]
+
+        # The sorted key only identifies the query; the encoder sees the query as written
+        misses: Dict[Tuple[str, str], str] = {}
+        for key, text in zip(keys, texts):
+            if key not in _QUERY_EMBEDDINGS:
+                misses.setdefault(key, text.strip())
+        if misses:
+            encoded = self.model.encode(
+                list(misses.values()),
+                batch_size=32,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+            for key, embedding in zip(misses, np.asarray(encoded, dtype=np.float32)):
+                embedding.flags.writeable = False  # shared between callers
+                _QUERY_EMBEDDINGS[key] = embedding
+
+        embeddings = []
+        for key in keys:
+            _QUERY_EMBEDDINGS.move_to_end(key)
+            embeddings.append(_QUERY_EMBEDDINGS[key])
+        while len(_QUERY_EMBEDDINGS) > QUERY_EMBEDDING_CACHE_SIZE:
+            _QUERY_EMBEDDINGS.popitem(last=False)
+        return np.vstack(embeddings)
+
     def search(self, query: str, k: int = 5) -> List[Tuple[str, float, dict]]:
         """Search for similar documents using cosine similarity"""
-        if self.embeddings is None or len(self.texts) == 0:
-            logger.warning("Vector store is empty, returning no results")
+        return self.search_batch([query], k=k)[0]
+
+    def search_batch(self, queries: List[str], k: int = 5) -> List[List[Tuple[str, float, dict]]]:
+        """Search for several queries at once: one encoder call and one matrix product for all of them"""
+        if not queries:
             return []
+        if k <= 0:
+            return [[] for _ in queries]
+        if len(self.texts) == 0:
+            logger.warning("Vector store is empty, returning no results")
+            return [[] for _ in queries]
             
         try:
-            # Generate query embedding
-            query_embedding = self.model.encode([query], show_progress_bar=False)
-            
-            # Calculate cosine similarities
-            similarities = cosine_similarity(query_embedding, self.embeddings)[0]
+            # Generate query embeddings (cached across searches and stores)
+            query_embeddings = self._embed_cached(queries)
             
-            # Get top-k results
-            top_indices = np.argsort(similarities)[::-1][:k]
+            if self.index is not None:
+                # Top-k from FAISS: exact fp16 scan, HNSW graph or IVFPQ codes
+                scores, indices = self.index.search(np.ascontiguousarray(query_embeddings, dtype=np.float32), k)
+                top = [
+                    [(int(idx), float(score)) for idx, score in zip(row_indices, row_scores) if idx >= 0]
+                    for row_indices, row_scores in zip(indices, scores)
+                ]
+            else:
+                # NumPy fallback without faiss. Rows and queries are unit length, so matrix products
+                # give the cosine similarities of every query against every chunk. The float16 rows
+                # are upcast a block at a time (NumPy has no BLAS path for float16), never as a whole copy
+                similarities = np.concatenate([
+                    query_embeddings @ self.embeddings[start:start + FALLBACK_BLOCK_ROWS].T.astype(np.float32)
+                    for start in range(0, len(self.embeddings), FALLBACK_BLOCK_ROWS)
+                ], axis=1)
+
+                # Select the top-k per query without sorting the whole store
+                if k < similarities.shape[1]:
+                    top_indices = np.argpartition(similarities, -k, axis=1)[:, -k:]
+                else:
+                    top_indices = np.tile(np.arange(similarities.shape[1]), (len(queries), 1))
+                top_scores = np.take_along_axis(similarities, top_indices, axis=1)
+                order = np.argsort(-top_scores, axis=1)
+                top_indices = np.take_along_axis(top_indices, order, axis=1)
+                top_scores = np.take_along_axis(top_scores, order, axis=1)
+                top = [
+                    [(int(idx), float(score)) for idx, score in zip(row_indices, row_scores)]
+                    for row_indices, row_scores in zip(top_indices, top_scores)
+                ]
             
-            results = []
-            for idx in top_indices:
-                if idx < len(self.texts):
-                    score = float(similarities[idx])
-                    results.append((
-                        self.texts[idx],
-                        score,
-                        self.metadata[idx] if idx < len(self.metadata) else {}
-                    ))
+            all_results = []
+            for row in top:
+                results = []
+                for idx, score in row:
+                    if idx < len(self.texts):
+                        results.append((
+                            self.texts[idx],
+                            score,
+                            self.metadata[idx] if idx < len(self.metadata) else {}
+                        ))
+                all_results.append(results)
             
-            logger.info(f"Found {len(results)} similar documents for query")
-            return results
+            logger.info(f"Found similar documents for {len(queries)} queries")
+            return all_results
             
         except Exception as e:
             logger.error(f"Search failed: {e}")
-            return []
\ No newline at end of file
+            return [[] for _ in queries]
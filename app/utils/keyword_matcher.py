@@ -0,0 +1,41 @@
+import ahocorasick
+from typing import List, Optional, Tuple
+
+
+class KeywordClassifier:
+    """
+    Classify lowercased text by priority-ordered keyword categories
+
+    All keywords live in one Aho-Corasick automaton, so every category is
+    checked in a single linear pass instead of one substring scan per keyword.
+    Categories earlier in the list win, matching an if/elif cascade.
+    """
+
+    def __init__(self, categories: List[Tuple[str, List[str]]]):
+        self.categories = [category for category, _ in categories]
+        self.automaton = ahocorasick.Automaton()
+        for rank, (category, keywords) in enumerate(categories):
+            for keyword in keywords:
+                existing = self.automaton.get(keyword, None)
+                # A keyword listed under several categories belongs to the highest-priority one
+                if existing is None or existing[0] > rank:
+                    self.automaton.add_word(keyword, (rank, category))
+        self.automaton.make_automaton()
+
+    def classify(self, text_lower: str, default: Optional[str] = None) -> Optional[str]:
+        """Return the highest-priority category with a keyword in text_lower"""
+        best_rank = len(self.categories)
+        for _, (rank, _category) in self.automaton.iter(text_lower):
+            if rank < best_rank:
+                best_rank = rank
+                if rank == 0:
+                    break
+
+        if best_rank < len(self.categories):
+            return self.categories[best_rank]
+        return default
+
+    def matches(self, text_lower: str) -> List[str]:
+        """Return every category with a keyword in text_lower, highest priority first"""
+        ranks = {rank for _, (rank, _category) in self.automaton.iter(text_lower)}
+        return [self.categories[rank] for rank in sorted(ranks)]